@@ -1,16 +1,25 @@
 import json
+import os
 import asyncio
+import logging
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable, Tuple
 
 import aiofiles
-from pydantic import Field
+from pydantic import BaseModel, ConfigDict, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+logger = logging.getLogger(__name__)
+
 
 # --- Nested Config Models ---
 
-class ToolConfig(BaseSettings):
+class ConfigSection(BaseModel):
+    """Base for nested sections: no env binding (only AppSettings reads env vars), unknown keys rejected"""
+    model_config = ConfigDict(extra="forbid")
+
+
+class ToolConfig(ConfigSection):
     name: str
     type: str
     enabled: bool = True
@@ -25,7 +34,7 @@ class ToolConfig(BaseSettings):
     headers: Optional[Dict[str, str]] = None  # For web tools that need custom headers
 
 
-class ModelConfig(BaseSettings):
+class ModelConfig(ConfigSection):
     provider: str = "groq"
     name: str = "llama3-8b-8192"
     api_key: str = ""  # Be set only in app_config.json
@@ -33,19 +42,19 @@ class ModelConfig(BaseSettings):
     max_tokens: int = 2048
 
 
-class AgentConfig(BaseSettings):
+class AgentConfig(ConfigSection):
     enabled: bool = True
     system_prompt: str = "You are a helpful Zalo assistant."
     tools: List[ToolConfig] = Field(default_factory=list)
     model: ModelConfig = Field(default_factory=ModelConfig)
 
 
-class ZaloOAConfig(BaseSettings):
+class ZaloOAConfig(ConfigSection):
     enabled: bool = True
     secret_key: str = ""  # Should be set in app_config.json
 
 
-class ZaloPersonalConfig(BaseSettings):
+class ZaloPersonalConfig(ConfigSection):
     enabled: bool = False
     phone: str = ""  # Set in app_config.json
     password: str = ""  # Set in app_config.json
@@ -53,7 +62,7 @@ class ZaloPersonalConfig(BaseSettings):
     cookies: Optional[Dict[str, str]] = None
 
 
-class ZaloConfig(BaseSettings):
+class ZaloConfig(ConfigSection):
     oa: ZaloOAConfig = Field(default_factory=ZaloOAConfig)
     personal: ZaloPersonalConfig = Field(default_factory=ZaloPersonalConfig)
 
@@ -72,12 +81,52 @@ class AppSettings(BaseSettings):
 
 # --- Config Manager to handle persistence ---
 
+ConfigSubscriber = Callable[[str, Any], Any]
+
+
 class ConfigManager:
     def __init__(self, storage_file: str = "data/app_config.json"):
         self._file = Path(storage_file)
         self._file.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_file = str(self._file) + ".tmp"
         self.settings: AppSettings = AppSettings()
         self._save_lock = asyncio.Lock()
+        # Subscribers are stored as (is_coroutine_function, callback)
+        self._subscribers: Dict[str, List[Tuple[bool, ConfigSubscriber]]] = {}
+        # Per-scope callbacks merged with the "*" subscribers, rebuilt lazily
+        self._dispatch_cache: Dict[str, Tuple[Tuple[bool, ConfigSubscriber], ...]] = {}
+
+    def subscribe(self, scope: str, callback: ConfigSubscriber):
+        """Call callback(scope, section) whenever the given settings section is updated ("*" for any section)"""
+        self._subscribers.setdefault(scope, []).append((asyncio.iscoroutinefunction(callback), callback))
+        self._dispatch_cache.clear()
+
+    def unsubscribe(self, scope: str, callback: ConfigSubscriber):
+        callbacks = self._subscribers.get(scope, [])
+        for entry in callbacks:
+            if entry[1] == callback:
+                callbacks.remove(entry)
+                self._dispatch_cache.clear()
+                break
+
+    def _build_dispatch(self, scope: str) -> Tuple[Tuple[bool, ConfigSubscriber], ...]:
+        callbacks = tuple(self._subscribers.get(scope, ())) + tuple(self._subscribers.get("*", ()))
+        self._dispatch_cache[scope] = callbacks
+        return callbacks
+
+    async def _notify(self, scope: str):
+        payload = getattr(self.settings, scope)
+        callbacks = self._dispatch_cache.get(scope)
+        if callbacks is None:
+            callbacks = self._build_dispatch(scope)
+        for is_coro, callback in callbacks:
+            try:
+                if is_coro:
+                    await callback(scope, payload)
+                else:
+                    callback(scope, payload)
+            except Exception:
+                logger.exception("Error in config subscriber for '%s'", scope)
 
     async def load(self):
         config_from_file = {}
@@ -87,30 +136,24 @@ class ConfigManager:
                     content = await f.read()
                     if content:
                         config_from_file = json.loads(content)
-            except Exception as e:
-                print(f"[ConfigManager] Error loading config file: {e}")
+            except Exception:
+                logger.exception("Error loading config file")
 
-        print("config_from_file --> ", self._file)
+        logger.debug("Loading config from %s", self._file)
         # This validates and merges data from file with defaults and env vars
         self.settings = AppSettings.model_validate(config_from_file)
 
-        print("config_manager.settings.agent_config.model.api_key -->", self.settings.agent_config.model)
-
     async def save(self):
         async with self._save_lock:
             try:
-                tmp = self._file.with_suffix(".tmp.json")
-                async with aiofiles.open(tmp, "w") as f:
+                async with aiofiles.open(self._tmp_file, "w") as f:
                     # model_dump will convert Pydantic models to dicts
                     await f.write(self.settings.model_dump_json(indent=2))
-                tmp.replace(self._file)
-            except Exception as e:
-                print(f"[ConfigManager] Error saving config file: {e}")
+                os.replace(self._tmp_file, self._file)
+            except Exception:
+                logger.exception("Error saving config file")
 
     async def update(self, data: Dict[str, Any]) -> AppSettings:
-        # Get current settings as a dict
-        updated_settings_data = self.settings.model_dump()
-
         # Recursive merge function
         def merge(a, b):
             for key, value in b.items():
@@ -120,14 +163,29 @@ class ConfigManager:
                     a[key] = value
             return a
 
-        # Merge new data into existing data
-        merged_data = merge(updated_settings_data, data)
-
-        # Re-validate the entire structure
-        self.settings = AppSettings.model_validate(merged_data)
+        if data and all(
+            key in AppSettings.model_fields and isinstance(value, dict)
+            for key, value in data.items()
+        ):
+            # Only dump, merge and re-validate the sections touched by the patch
+            sections = {}
+            for key, value in data.items():
+                current = getattr(self.settings, key)
+                merged_section = merge(current.model_dump(), value)
+                sections[key] = type(current).model_validate(merged_section)
+            self.settings = self.settings.model_copy(update=sections)
+        else:
+            # Fall back to merging into the full settings dict
+            merged_data = merge(self.settings.model_dump(), data)
+            self.settings = AppSettings.model_validate(merged_data)
 
         # Persist the changes
         await self.save()
+
+        # Let subscribers react to the sections that changed
+        for scope in data:
+            if scope in AppSettings.model_fields:
+                await self._notify(scope)
         return self.settings
 
 
@@ -4,7 +4,7 @@ Integration manager for external services like LangSmith.
 
 import os
 import logging
-from langsmith import Client
+from functools import cached_property
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -15,22 +15,28 @@ class IntegrationManager:
     def __init__(self):
         """Initialize integration manager and check for configured services"""
         # LangSmith integration
-        self.is_langsmith_configured = all([
-            os.environ.get("LANGCHAIN_API_KEY"),
-            os.environ.get("LANGCHAIN_PROJECT"),
-            os.environ.get("LANGCHAIN_ENDPOINT")
-        ])
+        api_key = os.environ.get("LANGCHAIN_API_KEY")
+        project = os.environ.get("LANGCHAIN_PROJECT")
+        endpoint = os.environ.get("LANGCHAIN_ENDPOINT")
+        self.is_langsmith_configured = all([api_key, project, endpoint])
+        self._langsmith_project = project if project is not None else "default"
         
         if self.is_langsmith_configured:
-            self.langsmith_client = Client()
             logger.info("LangSmith integration configured")
         else:
-            self.langsmith_client = None
             logger.info("LangSmith integration not configured")
+
+    @cached_property
+    def langsmith_client(self):
+        """LangSmith client, created on first access (None if LangSmith is not configured)"""
+        if not self.is_langsmith_configured:
+            return None
+        from langsmith import Client
+        return Client()
     
     def get_langsmith_project(self):
         """Get the configured LangSmith project name"""
-        return os.environ.get("LANGCHAIN_PROJECT", "default")
+        return self._langsmith_project
 
 # Singleton instance
 integration_manager = IntegrationManager() 
\ No newline at end of file
@@ -1,5 +1,9 @@
 import logging
 import asyncio
+import queue
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional, Dict, Any
 import threading
@@ -10,6 +14,13 @@ from .message_handler import MessageData, ZaloMessageHandler
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of received messages waiting to be handled, the oldest is dropped when full
+MESSAGE_QUEUE_SIZE = 1024
+# Events get a small separate lane that the consumer drains before messages
+EVENT_QUEUE_SIZE = 64
+# Messages processed concurrently, the agent call is I/O bound on the LLM API
+AGENT_WORKERS = 16
+
 class ZaloBot(ZaloAPI):
     """Custom Zalo bot implementation with message handling"""
 
@@ -23,17 +34,68 @@ class ZaloBot(ZaloAPI):
         
         # Initialize other attributes
         self.message_handler = None
-        self.last_activity = datetime.now()
+        self._last_activity = time.time()
         self.is_enabled = config_manager.settings.zalo_config.personal.enabled
         self.is_connected = False
+        # 1 when enabled and connected, the only flag checked by the zlapi callbacks
+        self._live = 0
         self.listen_thread = None
+        # listen() blocks for the lifetime of the connection, so it gets its own thread
+        self._listen_executor: Optional[ThreadPoolExecutor] = None
+
+        # Messages and events received by the listener thread, handled by the consumer thread
+        self._inbox: deque = deque(maxlen=MESSAGE_QUEUE_SIZE)
+        self._events: deque = deque(maxlen=EVENT_QUEUE_SIZE)
+        self._inbox_ready = threading.Event()
+        self.dropped_messages = 0
+        self.dropped_events = 0
+        self._consumer_thread: Optional[threading.Thread] = None
+        # Stop event of the running consumer, replaced on each start so a restart never waits for the old thread
+        self._consumer_stop: Optional[threading.Event] = None
+        # Agent calls run on this pool, their responses are sent one at a time by the sender thread
+        self._workers: Optional[ThreadPoolExecutor] = None
+        # At most AGENT_WORKERS messages in flight, the backlog waits in the bounded inbox
+        self._in_flight = threading.BoundedSemaphore(AGENT_WORKERS)
+        self._outbox: queue.SimpleQueue = queue.SimpleQueue()
+        self._sender_thread: Optional[threading.Thread] = None
+        # Whether _on_zalo_config_change is registered, it is while the bot is connected
+        self._subscribed = False
         
-        logger.info(f"ZaloBot instance created (not connected). Enabled: {self.is_enabled}")
+        logger.info("ZaloBot instance created (not connected). Enabled: %s", self.is_enabled)
         
         # Only connect if enabled
         if self.is_enabled:
             self.connect()
     
+    @property
+    def last_activity(self) -> datetime:
+        """Time the last user message was received"""
+        return datetime.fromtimestamp(self._last_activity)
+
+    def _subscribe_config(self) -> None:
+        """Keep is_enabled in sync with the personal config instead of re-reading it"""
+        if self._subscribed:
+            return
+        # Pick up changes made while the bot was not subscribed
+        self.is_enabled = config_manager.settings.zalo_config.personal.enabled
+        config_manager.subscribe("zalo_config", self._on_zalo_config_change)
+        self._subscribed = True
+
+    def _unsubscribe_config(self) -> None:
+        if not self._subscribed:
+            return
+        config_manager.unsubscribe("zalo_config", self._on_zalo_config_change)
+        self._subscribed = False
+
+    def _on_zalo_config_change(self, scope: str, zalo_config) -> None:
+        """Track the personal integration enabled flag when the Zalo config is updated"""
+        self.is_enabled = zalo_config.personal.enabled
+        self._update_live()
+
+    def _update_live(self) -> None:
+        """Recompute the callback guard after is_enabled or is_connected changes"""
+        self._live = int(self.is_enabled and self.is_connected)
+
     def connect(self) -> bool:
         """Connect to Zalo and initialize message handler"""
         if self.is_connected:
@@ -46,12 +108,15 @@ class ZaloBot(ZaloAPI):
             
             # Initialize message handler
             self.message_handler = ZaloMessageHandler(self)
+            self._subscribe_config()
             self.is_connected = True
-            logger.info(f"ZaloBot connected successfully with phone: {self.phone}")
+            self._update_live()
+            logger.info("ZaloBot connected successfully with phone: %s", self.phone)
             return True
         except Exception as e:
-            logger.error(f"Error connecting ZaloBot: {e}")
+            logger.error("Error connecting ZaloBot: %s", e)
             self.is_connected = False
+            self._update_live()
             return False
 
     def start_listening(self) -> bool:
@@ -64,83 +129,196 @@ class ZaloBot(ZaloAPI):
             logger.warning("Cannot start listening: ZaloBot is not connected")
             return False
         
+        # Before the listener check: after a disconnect the old listen future may not have resolved yet
+        self._start_consumer()
+
         if self.listen_thread and not self.listen_thread.done():
             logger.info("ZaloBot is already listening")
             return True
             
         try:
-            # Create and start the listening thread as an asyncio task
+            # Run the listening loop on a dedicated thread, tracked by an asyncio future
             loop = asyncio.get_running_loop()
-            self.listen_thread = loop.create_task(asyncio.to_thread(self.listen))
+            if self._listen_executor is None:
+                self._listen_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="zalo-listen")
+            self.listen_thread = loop.run_in_executor(self._listen_executor, self.listen)
             logger.info("ZaloBot started listening in background thread")
             return True
         except Exception as e:
-            logger.error(f"Error starting ZaloBot listening thread: {e}")
+            logger.error("Error starting ZaloBot listening thread: %s", e)
             return False
 
     def onMessage(self, mid, author_id, message, message_object, thread_id, thread_type):
         """Handles incoming messages and processes them through MessageHandler"""
         
         # Skip processing if bot is disabled
-        if not self.is_enabled or not self.is_connected:
+        if not self._live:
             logger.info("ZaloBot is disabled or not connected. Ignoring incoming message.")
             return
 
-        print("Message object:", message_object)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Message object: %s", message_object)
         # message_object.uidFrom !='0' là tin nhắn user gửi tới.
         if message_object.uidFrom !='0' :
+            # Plain float timestamp, converted to datetime off the listener thread
+            now = time.time()
+            self._last_activity = now
+
+            # Only queue the raw fields here, the consumer thread does the heavy work
+            self._enqueue((mid, author_id, message, thread_id, thread_type, now))
+
+    def _enqueue(self, item: tuple, priority: bool = False) -> None:
+        """Queue an item for the consumer thread, overwriting the oldest one if its lane is full"""
+        lane = self._events if priority else self._inbox
+        if len(lane) == lane.maxlen:
+            if priority:
+                self.dropped_events += 1
+            else:
+                self.dropped_messages += 1
+            logger.warning("%s queue is full. Dropping the oldest entry", "Event" if priority else "Message")
+        lane.append(item)
+        # A burst of messages only needs one wake-up, the consumer drains the whole queue
+        if not self._inbox_ready.is_set():
+            self._inbox_ready.set()
+
+    def _start_consumer(self) -> None:
+        """Start the thread that handles queued messages"""
+        if self._consumer_stop is not None and not self._consumer_stop.is_set():
+            return
+        # A fresh outbox per run, so a stop sentinel left in the old one never reaches the new sender.
+        # It is in place before the consumer starts, which may hand out leftover messages right away
+        self._outbox = queue.SimpleQueue()
+        self._sender_thread = threading.Thread(target=self._send_loop, args=(self._outbox,), name="zalo-sender", daemon=True)
+        self._sender_thread.start()
+        stop = threading.Event()
+        self._consumer_stop = stop
+        self._workers = ThreadPoolExecutor(max_workers=AGENT_WORKERS, thread_name_prefix="zalo-agent")
+        self._consumer_thread = threading.Thread(target=self._consume, args=(stop,), name="zalo-consumer", daemon=True)
+        self._consumer_thread.start()
+
+    def _stop_consumer(self) -> None:
+        """Ask the consumer thread to exit"""
+        if self._consumer_stop is not None:
+            self._consumer_stop.set()
+        self._inbox_ready.set()
+        if self._workers:
+            self._workers.shutdown(wait=False)
+            self._workers = None
+        # Sentinel telling the sender thread to exit
+        if self._sender_thread is not None and self._sender_thread.is_alive():
+            self._outbox.put(None)
+        self._sender_thread = None
+
+    def _consume(self, stop: threading.Event) -> None:
+        """Pop queued events and messages and run them through their handlers until stop is set"""
+        while not stop.is_set():
+            if self._events:
+                self._handle_event(*self._events.popleft())
+                continue
             try:
-                self.last_activity = datetime.now()
-
-                # Create message data object
-                message_data = MessageData(
-                    mid=str(mid),
-                    author_id=str(author_id),
-                    message=str(message) if message else "",
-                    thread_id=str(thread_id),
-                    thread_type=str(thread_type),
-                    timestamp=datetime.now()
-                )
-                
-                # Process message synchronously since we're in a callback
-                if self.message_handler:
-                    response = self.message_handler.process_message(message_data)
-                    if response:
-                        self.message_handler.send_response(
-                            response,
-                            message_data.thread_id,
-                            message_data.thread_type
-                        )
-                
+                item = self._inbox.popleft()
+            except IndexError:
+                # Clear before re-checking the queue so a message appended meanwhile re-arms the event
+                self._inbox_ready.wait()
+                self._inbox_ready.clear()
+                continue
+            self._handle(item, stop)
+
+    def _handle(self, item: tuple, stop: threading.Event) -> None:
+        """Build the MessageData for a queued message and process it on the worker pool"""
+        mid, author_id, message, thread_id, thread_type, timestamp = item
+        try:
+            # Create message data object, zlapi already passes most fields as str
+            message_data = MessageData(
+                mid=mid if type(mid) is str else str(mid),
+                author_id=author_id if type(author_id) is str else str(author_id),
+                message=(message if type(message) is str else str(message)) if message else "",
+                thread_id=thread_id if type(thread_id) is str else str(thread_id),
+                thread_type=str(thread_type),
+                timestamp=datetime.fromtimestamp(timestamp)
+            )
+
+            if self.message_handler and self._workers:
+                # Block until a worker is free instead of growing the executor's unbounded queue
+                self._in_flight.acquire()
+                # The bot may have been disconnected while waiting, hand the message to the next consumer
+                workers = self._workers
+                if stop.is_set() or not workers:
+                    self._in_flight.release()
+                    self._inbox.appendleft(item)
+                    self._inbox_ready.set()
+                    return
+                try:
+                    future = workers.submit(self.message_handler.process_message, message_data)
+                except Exception:
+                    self._in_flight.release()
+                    raise
+                future.add_done_callback(lambda f, md=message_data: self._send_result(f, md))
+        except Exception as e:
+            logger.error("Error handling message: %s", e)
+
+    def _send_result(self, future: Future, message_data: MessageData) -> None:
+        """Queue the response of a processed message for the sender thread"""
+        try:
+            response = future.result()
+            if response:
+                self._outbox.put((response, message_data.thread_id, message_data.thread_type))
+        except Exception as e:
+            logger.error("Error processing message: %s", e)
+        finally:
+            self._in_flight.release()
+
+    def _send_loop(self, outbox: queue.SimpleQueue) -> None:
+        """Send responses queued on outbox until the stop sentinel is received"""
+        while True:
+            item = outbox.get()
+            if item is None:
+                return
+            try:
+                self.message_handler.send_response(*item)
             except Exception as e:
-                logger.error(f"Error in onMessage: {e}")
+                logger.error("Error sending message response: %s", e)
 
     def onEvent(self, event_data, event_type):
         """Handle other Zalo events"""
-        # Skip processing if bot is disabled
-        if not self.is_enabled or not self.is_connected:
-            logger.info("ZaloBot is disabled or not connected. Ignoring incoming event.")
+        # Skip processing if bot is disabled, events (typing, presence...) are too frequent to log
+        if not self._live:
             return
-            
-        logger.info(f"Received event type: {event_type}")
+
+        self._enqueue((event_data, event_type), priority=True)
+
+    def _handle_event(self, event_data, event_type) -> None:
+        """Handle a queued Zalo event on the consumer thread"""
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Received event type: %s", event_type)
         # Add event handling logic here if needed
     
     def disconnect(self) -> bool:
         """Disconnect from Zalo and clean up resources"""
         try:
+            self._unsubscribe_config()
+            self._stop_consumer()
             if self.is_connected:
-                # Stop listening thread gracefully and logout
-                if hasattr(self, 'zalo'):
-                    if hasattr(self.zalo, 'stop'):
-                        self.zalo.stop()
-                    if hasattr(self.zalo, 'logout'):
-                        self.zalo.logout()
+                # Stop the listening loop by closing its websocket (set by ZaloAPI.listen)
+                ws = getattr(self, "ws", None)
+                if ws is not None:
+                    ws.close()
+                # Stop ZaloAPI's keep-alive timer, it would otherwise ping the closed websocket
+                timer = getattr(self, "ping_interval", None)
+                if timer:
+                    timer.cancel()
+                # The old listen future resolves later on the loop, don't let it block a new start_listening
+                self.listen_thread = None
 
                 self.is_connected = False
-                logger.info("ZaloBot disconnected and logged out successfully")
+                self._update_live()
+                if self._listen_executor:
+                    self._listen_executor.shutdown(wait=False)
+                    self._listen_executor = None
+                logger.info("ZaloBot disconnected")
             return True
         except Exception as e:
-            logger.error(f"Error disconnecting ZaloBot: {e}")
+            logger.error("Error disconnecting ZaloBot: %s", e)
             return False
             
     def get_status(self) -> Dict[str, Any]:
@@ -149,5 +327,7 @@ class ZaloBot(ZaloAPI):
             "enabled": self.is_enabled,
             "connected": self.is_connected,
             "listening": self.listen_thread is not None and not self.listen_thread.done(),
-            "last_activity": self.last_activity.isoformat() if hasattr(self, 'last_activity') else None
+            "last_activity": self.last_activity.isoformat(),
+            "dropped_messages": self.dropped_messages,
+            "dropped_events": self.dropped_events
         }
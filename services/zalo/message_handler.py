@@ -1,22 +1,64 @@
-import json
+import atexit
 import logging
+import queue
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Optional
 
-from pydantic import BaseModel
 from zlapi import ZaloAPI
 from zlapi.models import Message, ThreadType
 
-from services.advisor import agent_advisor
-
 logger = logging.getLogger(__name__)
 
-# Fallback response message
+
+class _RootForwarder(logging.Handler):
+    """Hands records taken off the log queue to the root logger's handlers"""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        logging.getLogger().handle(record)
+
+
+def _queue_logging(target: logging.Logger) -> QueueListener:
+    """Emit the logger's records from a background thread instead of the calling one"""
+    log_queue = queue.SimpleQueue()
+    target.addHandler(QueueHandler(log_queue))
+    target.propagate = False
+    listener = QueueListener(log_queue, _RootForwarder())
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+# Handler logs are written on every message, keep the stream I/O off the worker threads
+_log_listener = _queue_logging(logger)
+
+# MessageData.thread_type is str(ThreadType.X), plain names are accepted as well
+_THREAD_TYPES = {
+    str(ThreadType.USER): ThreadType.USER,
+    str(ThreadType.GROUP): ThreadType.GROUP,
+    "USER": ThreadType.USER,
+    "user": ThreadType.USER,
+    "GROUP": ThreadType.GROUP,
+    "group": ThreadType.GROUP,
+}
+
+
+@lru_cache(maxsize=128)
+def _message_for(text: str) -> Message:
+    """Return a (shared, read-only) Message for the given text"""
+    return Message(text=text)
+
+
+# Fallback response message, taken from the cache so process_message's fallback reuses this instance
 FALLBACK_RESPONSE = "Xin chào! Bạn có thể liên hệ đến sđt: 0358380646 để nhận được trợ giúp"
+_FALLBACK_MESSAGE = _message_for(FALLBACK_RESPONSE)
 
 
-class MessageData(BaseModel):
-    """Data model for Zalo messages"""
+@dataclass(slots=True, frozen=True)
+class MessageData:
+    """Data model for Zalo messages, fields are already normalised by the bot"""
     mid: str
     author_id: str
     message: str
@@ -28,59 +70,58 @@ class MessageData(BaseModel):
 class ZaloMessageHandler:
     """Handles processing and responding to incoming Zalo messages"""
 
+    __slots__ = ("bot",)
+
     def __init__(self, bot_instance: ZaloAPI):
         self.bot = bot_instance
 
     def process_message(self, message_data: MessageData) -> Optional[str]:
         """Process incoming message and return response if needed"""
         try:
-            logger.info(f"Processing message: {message_data.message} from {message_data.author_id}")
+            logger.info("Processing message: %s from %s", message_data.message, message_data.author_id)
 
             return self.handle_normal_message(message_data)
 
         except Exception as e:
-            logger.error(f"Error processing message: {e}")
+            logger.error("Error processing message: %s", e)
             return FALLBACK_RESPONSE
 
     def handle_normal_message(self, message_data: MessageData) -> str:
-        """Handle non-command messages by invoking the agent."""
-        try:
-            logger.info(f"Invoking agent_advisor for message: {message_data.message}")
-
-            # Prepare the input for the agent
-            agent_input = {
-                "messages": [{"role": "user", "content": message_data.message}]
-            }
+        """Handle non-command messages by invoking the agent (errors are handled by process_message)."""
+        # Imported here so the instance created at startup is used, not the import-time placeholder
+        from services.advisor import agent_advisor
 
-            # Invoke the agent
-            response = agent_advisor.invoke(agent_input)
+        logger.info("Invoking agent_advisor for message: %s", message_data.message)
 
-            # Extract the agent's final response
-            agent_response = response.get("output", "")
+        # Prepare the input for the agent
+        agent_input = {
+            "messages": [{"role": "user", "content": message_data.message}]
+        }
 
-            if not agent_response:
-                logger.warning("Agent returned an empty response.")
-                return FALLBACK_RESPONSE
+        # Invoke the agent
+        response = agent_advisor.invoke(agent_input)
 
-            return agent_response
+        # Extract the agent's final response
+        agent_response = response.get("output", "")
 
-        except Exception as e:
-            logger.error(f"Error invoking agent_advisor: {e}")
+        if not agent_response:
+            logger.warning("Agent returned an empty response.")
             return FALLBACK_RESPONSE
 
+        return agent_response
+
     def send_response(self, response: str, thread_id: str, thread_type: str) -> None:
         """Send response message back to Zalo"""
         try:
             if response:
-                message = Message(text=response)
-                self.bot.send(message, thread_id, ThreadType.USER)
-                logger.info(f"Sent response: {response}")
+                message = _message_for(response)
+                self.bot.send(message, thread_id, _THREAD_TYPES.get(thread_type, ThreadType.USER))
+                logger.info("Sent response: %s", response)
 
         except Exception as e:
-            logger.error(f"Error sending response: {e}")
+            logger.error("Error sending response: %s", e)
             try:
-                message = Message(text=FALLBACK_RESPONSE)
-                self.bot.send(message, thread_id, ThreadType.USER)
+                self.bot.send(_FALLBACK_MESSAGE, thread_id, _THREAD_TYPES.get(thread_type, ThreadType.USER))
                 logger.info("Sent fallback response")
             except Exception as e2:
-                logger.error(f"Error sending fallback response: {e2}")
+                logger.error("Error sending fallback response: %s", e2)
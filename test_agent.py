@@ -3,11 +3,6 @@
 Test script to debug agent initialization
 """
 import asyncio
-import sys
-import os
-
-# Add the project root to the Python path
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 async def test_agent():
     try:
@@ -40,4 +35,13 @@ async def test_agent():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    asyncio.run(test_agent()) 
\ No newline at end of file
+    try:
+        import uvloop
+    except ImportError:
+        uvloop = None
+
+    # uvloop is optional (not available on Windows), fall back to the default loop
+    if uvloop is not None:
+        uvloop.run(test_agent())
+    else:
+        asyncio.run(test_agent()) 
\ No newline at end of file
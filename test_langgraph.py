@@ -2,11 +2,6 @@
 """
 Test script to check langgraph functionality
 """
-import sys
-import os
-
-# Add the project root to the Python path
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 def test_langgraph():
     try: